@@ -449,7 +449,7 @@ def main(args):
 def discriminator_step(
     args, batch, generator, discriminator, d_loss_fn, optimizer_d
 ):
-    batch = [tensor.cuda() for tensor in batch]
+    batch = [tensor.cuda(non_blocking=True) for tensor in batch]
     (obs_traj, pred_traj_gt, obs_traj_rel, pred_traj_gt_rel,
      obs_team_vec, obs_pos_vec, pred_team_vec, pred_pos_vec,
      non_linear_ped, loss_mask, seq_start_end) = batch
@@ -496,7 +496,7 @@ def discriminator_step(
 def generator_step(
     args, batch, generator, discriminator, g_loss_fn, optimizer_g
 ):
-    batch = [tensor.cuda() for tensor in batch]
+    batch = [tensor.cuda(non_blocking=True) for tensor in batch]
     (obs_traj, pred_traj_gt, obs_traj_rel, pred_traj_gt_rel,
      obs_team_vec, obs_pos_vec, pred_team_vec, pred_pos_vec,
      non_linear_ped, loss_mask, seq_start_end) = batch
@@ -568,7 +568,7 @@ def check_accuracy(
     generator.eval()
     with torch.no_grad():
         for batch in loader:
-            batch = [tensor.cuda() for tensor in batch]
+            batch = [tensor.cuda(non_blocking=True) for tensor in batch]
             (obs_traj, pred_traj_gt, obs_traj_rel, pred_traj_gt_rel,
              obs_team_vec, obs_pos_vec, pred_team_vec, pred_pos_vec,
              non_linear_ped, loss_mask, seq_start_end) = batch
@@ -1,3 +1,4 @@
+import torch
 from torch.utils.data import DataLoader
 
 # from sgan.data.trajectories import TrajectoryDataset, seq_collate
@@ -5,6 +6,12 @@ from torch.utils.data import DataLoader
 from sgan.data.trajectories_general import TrajectoryDataset, seq_collate
 
 
+def worker_init_fn(worker_id):
+    # Workers only slice memory-mapped arrays; one intra-op thread each
+    # avoids oversubscribing the cores
+    torch.set_num_threads(1)
+
+
 def data_loader(args, path):
     dset = TrajectoryDataset(
         path,
@@ -17,10 +24,19 @@ def data_loader(args, path):
         trajD=args.trajD
     )
 
+    # Pinned batches let the .cuda(non_blocking=True) copies in training
+    # overlap with compute; keep workers alive and a few batches ahead
+    worker_kwargs = {}
+    if args.loader_num_workers > 0:
+        worker_kwargs = dict(persistent_workers=True, prefetch_factor=4,
+                             worker_init_fn=worker_init_fn)
+
     loader = DataLoader(
         dset,
         batch_size=args.batch_size,
         shuffle=True,
         num_workers=args.loader_num_workers,
-        collate_fn=seq_collate)
+        collate_fn=seq_collate,
+        pin_memory=torch.cuda.is_available(),
+        **worker_kwargs)
     return dset, loader
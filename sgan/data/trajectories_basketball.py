@@ -1,45 +1,74 @@
+import hashlib
 import logging
 import os
 import math
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from tqdm import tqdm
 
 import numpy as np
+import pandas as pd
+
+from numba import njit
 
 import torch
 from torch.utils.data import Dataset
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the layout of the cached arrays changes
+_CACHE_VERSION = 5
+_CACHED_ARRAYS = (
+    'seq_list', 'seq_list_rel', 'team_vec_list', 'pos_vec_list',
+    'loss_mask_list', 'non_linear_ped', 'num_peds_in_seq'
+)
 
-def isfloat(value):
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
+# Fixed basketball schema. These are plain module globals, so numba treats
+# them as compile-time constants inside _build_sequences.
+TEAM_VEC_LEN = 3  # [ 0 1 ball]
+POSITION_IDS = ["C", "F", "G", "ball"]
+POS_VEC_LEN = len(POSITION_IDS)
+_POSITION_INDEX = {pos: i for i, pos in enumerate(POSITION_IDS)}
+
+
+def _cat_peds(seq_list, cum_start_idx):
+    """
+    Copy (seq_len, peds, input_size) slices side by side into one
+    preallocated, contiguous (seq_len, total_peds, input_size) tensor
+    """
+    first = seq_list[0]
+    out = first.new_empty((first.size(0), cum_start_idx[-1], first.size(2)))
+    for seq, start, end in zip(seq_list, cum_start_idx, cum_start_idx[1:]):
+        out[:, start:end].copy_(seq)
+    return out
 
 
 def seq_collate(data):
+    """
+    collate_fn for loading TrajectoryDataset one sequence at a time.
+    TrajectoryDataset.get_batch returns the same batch without going
+    through the individual items.
+    """
     (obs_seq_list, pred_seq_list, obs_seq_rel_list, pred_seq_rel_list,
      obs_team_vec_list, obs_pos_vec_list, pred_team_vec_list, pred_pos_vec_list,
      non_linear_ped_list, loss_mask_list) = zip(*data)
 
-    _len = [len(seq) for seq in obs_seq_list]
+    _len = [seq.size(1) for seq in obs_seq_list]
     cum_start_idx = [0] + np.cumsum(_len).tolist()
     seq_start_end = [[start, end]
                      for start, end in zip(cum_start_idx, cum_start_idx[1:])]
 
-    # Data format: batch, input_size, seq_len
-    # LSTM input format: seq_len, batch, input_size
-    obs_traj = torch.cat(obs_seq_list, dim=0).permute(2, 0, 1)
-    pred_traj = torch.cat(pred_seq_list, dim=0).permute(2, 0, 1)
-    obs_traj_rel = torch.cat(obs_seq_rel_list, dim=0).permute(2, 0, 1)
-    pred_traj_rel = torch.cat(pred_seq_rel_list, dim=0).permute(2, 0, 1)
+    # Data format is already the LSTM input format: seq_len, batch, input_size
+    obs_traj = _cat_peds(obs_seq_list, cum_start_idx)
+    pred_traj = _cat_peds(pred_seq_list, cum_start_idx)
+    obs_traj_rel = _cat_peds(obs_seq_rel_list, cum_start_idx)
+    pred_traj_rel = _cat_peds(pred_seq_rel_list, cum_start_idx)
 
-    obs_team_vec = torch.cat(obs_team_vec_list, dim=0).permute(2, 0, 1)
-    obs_pos_vec = torch.cat(obs_pos_vec_list, dim=0).permute(2, 0, 1)
-    pred_team_vec = torch.cat(pred_team_vec_list, dim=0).permute(2, 0, 1)
-    pred_pos_vec = torch.cat(pred_pos_vec_list, dim=0).permute(2, 0, 1)
+    obs_team_vec = _cat_peds(obs_team_vec_list, cum_start_idx)
+    obs_pos_vec = _cat_peds(obs_pos_vec_list, cum_start_idx)
+    pred_team_vec = _cat_peds(pred_team_vec_list, cum_start_idx)
+    pred_pos_vec = _cat_peds(pred_pos_vec_list, cum_start_idx)
 
     non_linear_ped = torch.cat(non_linear_ped_list)
     loss_mask = torch.cat(loss_mask_list, dim=0)
@@ -54,75 +83,169 @@ def seq_collate(data):
 
 
 def read_file(_path, delim='\t'):
-    lines = []
     if delim == 'tab':
         delim = '\t'
     elif delim == 'space':
         delim = ' '
-    with open(_path, 'r') as f:
-        next(f)
-        for line in f:
-            line = line.strip().split(delim)
-            line = [float(i) if isfloat(i) else i for i in line]
-            lines.append(line)
-    return lines
+    # header line has no name for the index column, so skip it and name
+    # the columns ourselves. Every column is typed up front: "ball" in the
+    # team_id / player_id columns is read as NaN so both parse as floats.
+    return pd.read_csv(
+        _path, sep=delim, header=None, skiprows=1,
+        names=['idx', 'frame_id', 'team_id', 'player_id',
+               'pos_x', 'pos_y', 'player_position'],
+        dtype={'idx': np.float64, 'frame_id': np.float64,
+               'team_id': np.float64, 'player_id': np.float64,
+               'pos_x': np.float64, 'pos_y': np.float64,
+               'player_position': str},
+        na_values={'team_id': ['ball'], 'player_id': ['ball']},
+        keep_default_na=False)
 
 
 def parse_file(_path, delim='\t'):
-    data = []
     if delim == 'tab':
         delim = '\t'
     elif delim == 'space':
         delim = ' '
-    lines = read_file(_path, delim)
-    team_ids = np.unique([int(line[2]) for line in lines if isfloat(line[2])]).tolist()
-    posi_ids = ["C", "F", "G", "ball"]
-
-    for line in lines:
-        row = []
-        team_vector = [0.0] * 3  # 0 1 ball
-        pos_vector = [0.0] * 4  # 0 1 2 ball
-        for col, value in enumerate(line):
-            if col == 2:  # team_id
-                if value == "ball":
-                    team_vector[2] = 1.0
-                else:
-                    team = team_ids.index(int(value))
-                    team_vector[team] = 1.0
-            elif col == 3:  # player_id
-                if value == "ball":
-                    row.append(-1.0)
-                else:
-                    row.append(value)  # float
-            elif col == 6:  # player_position
-                positions = value.strip('"').split(",")
-                for pos in positions:
-                    pos_vector[posi_ids.index(pos)] = 1.0
-            else:
-                row.append(value)  # float
-        row += team_vector  # team_id
-        row += pos_vector  # player_position
-
-        data.append(row)
-    return np.asarray(data)
+    df = read_file(_path, delim)
+    num_rows = len(df)
+
+    # Team vector: [0 1 ball]
+    team_col = df['team_id'].values
+    is_ball = np.isnan(team_col)
+    team_col = team_col[~is_ball]
+    # hash-based unique over the column, then sort the couple of ids found
+    team_ids = np.sort(pd.unique(team_col))
+    team_idx = np.full(num_rows, TEAM_VEC_LEN - 1, dtype=np.int64)
+    team_idx[~is_ball] = np.searchsorted(team_ids, team_col)
+    team_vector = np.zeros((num_rows, TEAM_VEC_LEN))
+    team_vector[np.arange(num_rows), team_idx] = 1.0
+
+    # Position vector: [C F G ball], a player may hold several positions.
+    # Only the few distinct strings are split; rows then index that table.
+    pos_codes, pos_strings = pd.factorize(df['player_position'])
+    pos_table = np.zeros((len(pos_strings), POS_VEC_LEN))
+    for i, value in enumerate(pos_strings):
+        for pos in value.strip('"').split(","):
+            pos_table[i, _POSITION_INDEX[pos]] = 1.0
+    pos_vector = pos_table[pos_codes]
+
+    player_id = df['player_id'].values
+    player_id = np.where(np.isnan(player_id), -1.0, player_id)  # ball
+    data = np.column_stack([
+        df['idx'].values, df['frame_id'].values, player_id,
+        df['pos_x'].values, df['pos_y'].values
+    ])
+    data = np.around(data, decimals=4)
+    return np.concatenate([data, team_vector, pos_vector], axis=1)
 
 
 def poly_fit(traj, traj_len, threshold):
     """
     Input:
-    - traj: Numpy array of shape (2, traj_len)
+    - traj: Numpy array of shape (seq_len, num_peds, 2)
     - traj_len: Len of trajectory
     - threshold: Minimum error to be considered for non linear traj
     Output:
-    - int: 1 -> Non Linear 0-> Linear
+    - Numpy array of shape (num_peds,): 1 -> Non Linear 0-> Linear
     """
+    num_peds = traj.shape[1]
     t = np.linspace(0, traj_len - 1, traj_len)
-    res_x = np.polyfit(t, traj[0, -traj_len:], 2, full=True)[1]
-    res_y = np.polyfit(t, traj[1, -traj_len:], 2, full=True)[1]
-    if res_x + res_y >= threshold:
-        return 1.0
-    else:
-        return 0.0
+    # one least squares solve against a shared Vandermonde matrix, with the
+    # x and y series of every pedestrian as columns
+    y = traj[-traj_len:].reshape(traj_len, num_peds * 2)
+    res = np.polyfit(t, y, 2, full=True)[1]
+    res = res.reshape(num_peds, 2).sum(axis=1)
+    return (res >= threshold).astype(np.float32)
+
+
+@njit(cache=True, fastmath=True)
+def _build_sequences(
+        data_sorted, frame_starts, frame_counts, frame_ids, seq_len, skip,
+        num_sequences, min_ped, factor, out_seq, out_loss_mask, out_team,
+        out_pos, out_num_peds
+):
+    """
+    Input:
+    - data_sorted: Parsed rows (see parse_file) ordered by frame_ids
+    - frame_starts, frame_counts: Row range of each frame in data_sorted
+    - frame_ids: Sorted frame_id of each frame
+    - out_*: Buffers large enough to hold every player of every sequence,
+      laid out as (seq_len, num_peds, input_size) except out_loss_mask
+    - out_num_peds: Buffer for the number of players of each sequence
+    Output:
+    - write: Number of players written to the out_* buffers
+    - num_seq: Number of sequences written to out_num_peds
+    """
+    num_frames = len(frame_ids)
+    write = 0
+    num_seq = 0
+    for idx in range(0, num_sequences * skip + 1, skip):
+        if idx >= num_frames:
+            break
+        last = min(idx + seq_len, num_frames) - 1
+        curr_seq_data = data_sorted[
+            frame_starts[idx]:frame_starts[last] + frame_counts[last]]
+        # group rows by player_id (frame_id order kept within a player)
+        order = np.argsort(curr_seq_data[:, 2], kind='mergesort')
+
+        num_peds_considered = 0
+        ped_start = 0
+        num_rows = len(order)
+        while ped_start < num_rows:
+            ped_id = curr_seq_data[order[ped_start], 2]
+            ped_end = ped_start + 1
+            while ped_end < num_rows and \
+                    curr_seq_data[order[ped_end], 2] == ped_id:
+                ped_end += 1
+            # players without one row per step are dropped; check the row
+            # count from the grouping before looking up any frame offsets
+            if ped_end - ped_start != seq_len:
+                ped_start = ped_end
+                continue
+            pad_front = np.searchsorted(
+                frame_ids, curr_seq_data[order[ped_start], 1]) - idx
+            pad_end = np.searchsorted(
+                frame_ids, curr_seq_data[order[ped_end - 1], 1]) - idx + 1
+            if pad_end - pad_front == seq_len:
+                _idx = write + num_peds_considered
+                for t in range(seq_len):
+                    row = order[ped_start + t]
+                    step = pad_front + t
+                    out_seq[step, _idx, 0] = curr_seq_data[row, 3] * factor  # x
+                    out_seq[step, _idx, 1] = curr_seq_data[row, 4] * factor  # y
+                    out_loss_mask[_idx, step] = 1
+                    for c in range(TEAM_VEC_LEN):  # [ 0 1 ball]
+                        out_team[step, _idx, c] = curr_seq_data[row, 5 + c]
+                    for c in range(POS_VEC_LEN):  # [ C F G ball]
+                        out_pos[step, _idx, c] = curr_seq_data[
+                            row, 5 + TEAM_VEC_LEN + c]
+                num_peds_considered += 1
+            ped_start = ped_end
+
+        if num_peds_considered > min_ped:
+            out_num_peds[num_seq] = num_peds_considered
+            num_seq += 1
+            write += num_peds_considered
+    return write, num_seq
+
+
+def _save_cache(arrays, cache_path):
+    """
+    Write arrays as one .npy each into the directory cache_path. The files
+    are written to a temporary directory that is then renamed into place;
+    if another process got there first, its copy is kept.
+    """
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        os.makedirs(tmp_path)
+        for key, value in arrays.items():
+            np.save(os.path.join(tmp_path, key + '.npy'), value)
+        os.rename(tmp_path, cache_path)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        if not os.path.isdir(cache_path):
+            raise
 
 
 class TrajectoryDataset(Dataset):
@@ -130,7 +253,8 @@ class TrajectoryDataset(Dataset):
 
     def __init__(
             self, data_dir, obs_len=8, pred_len=12, skip=1, threshold=0.002,
-            min_ped=1, delim='\t', metric="meter"
+            min_ped=1, delim='\t', metric="meter", cache_dir=None,
+            use_cache=True
     ):
         """
         Args:
@@ -143,6 +267,9 @@ class TrajectoryDataset(Dataset):
         when using a linear predictor
         - min_ped: Minimum number of pedestrians that should be in a seqeunce
         - delim: Delimiter in the dataset files
+        - cache_dir: Directory for the parsed-sequence cache, defaults to
+        a "cache" directory next to data_dir
+        - use_cache: Set to False to always parse and never write a cache
 
         columns in csv file:
         (idx), frame_id,team_id,player_id,pos_x, pos_y, player_position
@@ -165,131 +292,195 @@ class TrajectoryDataset(Dataset):
         else:
             self.factor=1.0 # foot to foot
 
-        all_files = os.listdir(self.data_dir)
+        all_files = sorted(os.listdir(self.data_dir))
         all_files = [os.path.join(self.data_dir, _path) for _path in all_files]
+
+        # Parsed sequences are cached next to data_dir, keyed by the input
+        # files and every argument that changes the result
+        cache_key = hashlib.md5(repr((
+            _CACHE_VERSION, os.path.abspath(self.data_dir),
+            [(_path, os.path.getmtime(_path)) for _path in all_files],
+            self.obs_len, self.pred_len, self.skip, threshold, min_ped,
+            self.delim, self.factor
+        )).encode()).hexdigest()
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.dirname(os.path.abspath(self.data_dir)), 'cache')
+        cache_path = os.path.join(cache_dir, cache_key)
+
+        # Each array is its own .npy so it can be memory-mapped: slices are
+        # paged in on access instead of the whole dataset living in RAM
+        arrays = None
+        if use_cache and os.path.isdir(cache_path):
+            logger.info('Loading cached dataset from {}'.format(cache_path))
+        else:
+            arrays = self._build_arrays(all_files, threshold, min_ped)
+            if use_cache:
+                try:
+                    _save_cache(arrays, cache_path)
+                    arrays = None
+                except OSError as e:
+                    # e.g. a read-only dataset tree; keep the arrays in memory
+                    logger.warning('Could not write dataset cache {}: {}'.format(
+                        cache_path, e))
+        if arrays is None:
+            # copy-on-write maps are writable, which torch.from_numpy expects
+            arrays = {
+                key: np.load(os.path.join(cache_path, key + '.npy'), mmap_mode='c')
+                for key in _CACHED_ARRAYS
+            }
+
+        seq_list = arrays['seq_list']
+        seq_list_rel = arrays['seq_list_rel']
+        team_vec_list = arrays['team_vec_list']
+        pos_vec_list = arrays['pos_vec_list']
+        loss_mask_list = arrays['loss_mask_list']
+        non_linear_ped = arrays['non_linear_ped']
+        num_peds_in_seq = arrays['num_peds_in_seq']
+        self.num_seq = len(num_peds_in_seq)
+
+        # Convert numpy -> Torch Tensor; arrays are float32 already, so
+        # these are views rather than copies
+        self.obs_traj = torch.from_numpy(seq_list[:self.obs_len])
+        self.pred_traj = torch.from_numpy(seq_list[self.obs_len:])
+        self.obs_traj_rel = torch.from_numpy(seq_list_rel[:self.obs_len])
+        self.pred_traj_rel = torch.from_numpy(seq_list_rel[self.obs_len:])
+
+        self.obs_team_vec = torch.from_numpy(team_vec_list[:self.obs_len])
+        self.obs_pos_vec = torch.from_numpy(pos_vec_list[:self.obs_len])
+
+        self.obs_team_vec_pred = torch.from_numpy(team_vec_list[self.obs_len:])
+        self.obs_pos_vec_pred = torch.from_numpy(pos_vec_list[self.obs_len:])
+
+        self.loss_mask = torch.from_numpy(loss_mask_list)
+        self.non_linear_ped = torch.from_numpy(non_linear_ped)
+        cum_start_idx = np.cumsum(num_peds_in_seq)
+        self.seq_start_end = torch.from_numpy(np.stack(
+            [cum_start_idx - num_peds_in_seq, cum_start_idx], axis=1))
+
+    def _build_arrays(self, all_files, threshold, min_ped):
+        """Parse all_files and assemble the sequences as numpy arrays"""
         num_peds_in_seq = []
         seq_list = []
-        seq_list_rel = []
         loss_mask_list = []
-        non_linear_ped = []
         team_vec_list = []
         pos_vec_list = []
 
-        for path in tqdm(all_files):
-            data = parse_file(path, delim)
-
-            frames = np.unique(data[:, 0]).tolist()
-            frame_data = []
-            for frame in frames:
-                frame_data.append(data[frame == data[:, 1], :])  # frame_id
-            num_sequences = int(
-                math.ceil((len(frames) - self.seq_len + 1) / skip))
-
-            for idx in range(0, num_sequences * self.skip + 1, skip):
-                curr_seq_data = np.concatenate(
-                    frame_data[idx:idx + self.seq_len], axis=0)
-                peds_in_curr_seq = np.unique(curr_seq_data[:, 2])  # player_id
-                curr_seq_rel = np.zeros((len(peds_in_curr_seq), 2,
-                                         self.seq_len))
-                curr_seq = np.zeros((len(peds_in_curr_seq), 2, self.seq_len))
-                curr_loss_mask = np.zeros((len(peds_in_curr_seq),
-                                           self.seq_len))
-                # vectors
-                curr_team = np.zeros((len(peds_in_curr_seq), 3, self.seq_len))  # 0 1 ball
-                curr_position = np.zeros((len(peds_in_curr_seq), 4, self.seq_len))  # C F G ball
-
-                num_peds_considered = 0
-                _non_linear_ped = []
-
-                for _, ped_id in enumerate(peds_in_curr_seq):
-                    curr_ped_seq_full = curr_seq_data[curr_seq_data[:, 2] == ped_id, :]  # player_id
-                    curr_ped_seq_full = np.around(curr_ped_seq_full, decimals=4)
-                    pad_front = frames.index(curr_ped_seq_full[0, 1]) - idx  # frame_id
-                    pad_end = frames.index(curr_ped_seq_full[-1, 1]) - idx + 1  # frame_id
-                    if pad_end - pad_front != self.seq_len or curr_ped_seq_full.shape[0] != self.seq_len:
-                        continue
-                    curr_ped_seq = np.transpose(curr_ped_seq_full[:, 3:5])  # x,y
-                    curr_ped_seq = curr_ped_seq * self.factor # conversion
-                    # Make coordinates relative
-                    rel_curr_ped_seq = np.zeros(curr_ped_seq.shape)
-                    rel_curr_ped_seq[:, 1:] = curr_ped_seq[:, 1:] - curr_ped_seq[:, :-1]
-                    _idx = num_peds_considered
-
-                    curr_seq[_idx, :, pad_front:pad_end] = curr_ped_seq
-                    curr_seq_rel[_idx, :, pad_front:pad_end] = rel_curr_ped_seq
-                    # Linear vs Non-Linear Trajectory
-                    _non_linear_ped.append(
-                        poly_fit(curr_ped_seq, pred_len, threshold))
-                    curr_loss_mask[_idx, pad_front:pad_end] = 1
-
-                    # Team vector
-                    curr_ped_team = np.transpose(curr_ped_seq_full[:, 5:8])  # [ 0 1 ball]
-                    curr_team[_idx, :, pad_front:pad_end] = curr_ped_team
-
-                    # Position Vector
-                    curr_ped_pos = np.transpose(curr_ped_seq_full[:, 8:])  # [ C F G ball]
-                    curr_position[_idx, :, pad_front:pad_end] = curr_ped_pos
-
-                    num_peds_considered += 1
-
-                if num_peds_considered > min_ped:
-                    non_linear_ped += _non_linear_ped
-                    num_peds_in_seq.append(num_peds_considered)
-                    loss_mask_list.append(curr_loss_mask[:num_peds_considered])
-                    seq_list.append(curr_seq[:num_peds_considered])
-                    seq_list_rel.append(curr_seq_rel[:num_peds_considered])
-                    team_vec_list.append(curr_team[:num_peds_considered])  # team vector
-                    pos_vec_list.append(curr_position[:num_peds_considered])  # pos_vec_list
-
-        self.num_seq = len(seq_list)
-        seq_list = np.concatenate(seq_list, axis=0)
-        seq_list_rel = np.concatenate(seq_list_rel, axis=0)
-
-        team_vec_list = np.concatenate(team_vec_list, axis=0)
-        pos_vec_list = np.concatenate(pos_vec_list, axis=0)
+        # Files are independent, so parse them in worker processes while
+        # this process assembles sequences from the ones already parsed
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            parsed = executor.map(parse_file, all_files, repeat(self.delim))
+            for data in tqdm(parsed, total=len(all_files)):
+                frames = np.unique(data[:, 0])
+                # Sort rows by frame_id once; each frame is then the contiguous
+                # row range [frame_starts, frame_starts + frame_counts)
+                data_sorted = data[np.isin(data[:, 1], frames)]  # frame_id
+                data_sorted = data_sorted[
+                    np.argsort(data_sorted[:, 1], kind='mergesort')]
+                frame_starts = np.searchsorted(data_sorted[:, 1], frames, side='left')
+                frame_counts = np.searchsorted(
+                    data_sorted[:, 1], frames, side='right') - frame_starts
+                num_sequences = int(
+                    math.ceil((len(frames) - self.seq_len + 1) / self.skip))
+                num_starts = len(range(0, num_sequences * self.skip + 1, self.skip))
+
+                # Preallocate for the most players that can be kept: every
+                # player in every sequence, and no more than the rows allow
+                # (a kept player uses seq_len rows and a row lies in at most
+                # ceil(seq_len / skip) sequences). Kept rows are written back
+                # to back and the used part copied out.
+                max_peds = min(
+                    len(pd.unique(data[:, 2])) * num_starts,
+                    len(data_sorted) * -(-self.seq_len // self.skip) // self.seq_len)
+                seq_buf = np.zeros((self.seq_len, max_peds, 2), dtype=np.float32)
+                loss_mask_buf = np.zeros((max_peds, self.seq_len), dtype=np.float32)
+                # one-hot vectors are stored as uint8 and cast to float on device
+                team_buf = np.zeros(
+                    (self.seq_len, max_peds, TEAM_VEC_LEN), dtype=np.uint8)
+                position_buf = np.zeros(
+                    (self.seq_len, max_peds, POS_VEC_LEN), dtype=np.uint8)
+                num_peds_buf = np.zeros(num_starts, dtype=np.int64)
+
+                write, num_seq = _build_sequences(
+                    data_sorted, frame_starts, frame_counts,
+                    frames, self.seq_len, self.skip,
+                    num_sequences, min_ped, self.factor, seq_buf, loss_mask_buf,
+                    team_buf, position_buf, num_peds_buf)
+
+                num_peds_in_seq += num_peds_buf[:num_seq].tolist()
+                # copies, so each file's full-size buffers are freed here
+                loss_mask_list.append(loss_mask_buf[:write].copy())
+                seq_list.append(seq_buf[:, :write].copy())
+                team_vec_list.append(team_buf[:, :write].copy())  # team vector
+                pos_vec_list.append(position_buf[:, :write].copy())  # pos_vec_list
+
+        # Arrays are kept in the LSTM input format: seq_len, num_peds, input_size
+        seq_list = np.concatenate(seq_list, axis=1)
+        # Make coordinates relative; every kept player spans the full
+        # sequence so the first step is left at zero
+        seq_list_rel = np.zeros_like(seq_list)
+        seq_list_rel[1:] = np.diff(seq_list, axis=0)
+
+        team_vec_list = np.concatenate(team_vec_list, axis=1)
+        pos_vec_list = np.concatenate(pos_vec_list, axis=1)
 
         loss_mask_list = np.concatenate(loss_mask_list, axis=0)
-        non_linear_ped = np.asarray(non_linear_ped)
-
-        # Convert numpy -> Torch Tensor
-        self.obs_traj = torch.from_numpy(
-            seq_list[:, :, :self.obs_len]).type(torch.float)
-        self.pred_traj = torch.from_numpy(
-            seq_list[:, :, self.obs_len:]).type(torch.float)
-        self.obs_traj_rel = torch.from_numpy(
-            seq_list_rel[:, :, :self.obs_len]).type(torch.float)
-        self.pred_traj_rel = torch.from_numpy(
-            seq_list_rel[:, :, self.obs_len:]).type(torch.float)
-
-        self.obs_team_vec = torch.from_numpy(
-            team_vec_list[:, :, :self.obs_len]).type(torch.float)
-        self.obs_pos_vec = torch.from_numpy(
-            pos_vec_list[:, :, :self.obs_len]).type(torch.float)
-
-        self.obs_team_vec_pred = torch.from_numpy(
-            team_vec_list[:, :, self.obs_len:]).type(torch.float)
-        self.obs_pos_vec_pred = torch.from_numpy(
-            pos_vec_list[:, :, self.obs_len:]).type(torch.float)
-
-        self.loss_mask = torch.from_numpy(loss_mask_list).type(torch.float)
-        self.non_linear_ped = torch.from_numpy(non_linear_ped).type(torch.float)
-        cum_start_idx = [0] + np.cumsum(num_peds_in_seq).tolist()
-        self.seq_start_end = [
-            (start, end)
-            for start, end in zip(cum_start_idx, cum_start_idx[1:])
-        ]
+        # Linear vs Non-Linear Trajectory
+        non_linear_ped = poly_fit(seq_list, self.pred_len, threshold)
 
+        return {
+            'seq_list': seq_list, 'seq_list_rel': seq_list_rel,
+            'team_vec_list': team_vec_list, 'pos_vec_list': pos_vec_list,
+            'loss_mask_list': loss_mask_list, 'non_linear_ped': non_linear_ped,
+            'num_peds_in_seq': np.asarray(num_peds_in_seq, dtype=np.int64),
+        }
 
     def __len__(self):
         return self.num_seq
 
     def __getitem__(self, index):
-        start, end = self.seq_start_end[index]
+        """
+        An int index returns the slices of one sequence (see seq_collate);
+        a list of indices, as yielded by a BatchSampler with batch_size=None,
+        returns the collated batch directly (see get_batch)
+        """
+        if isinstance(index, (list, tuple)):
+            return self.get_batch(index)
+        start, end = self.seq_start_end[index].tolist()
         out = [
-            self.obs_traj[start:end, :], self.pred_traj[start:end, :],
-            self.obs_traj_rel[start:end, :], self.pred_traj_rel[start:end, :],
-            self.obs_team_vec[start:end, :], self.obs_pos_vec[start:end, :],
-            self.obs_team_vec_pred[start: end, :], self.obs_pos_vec_pred[start: end, :],
+            self.obs_traj[:, start:end], self.pred_traj[:, start:end],
+            self.obs_traj_rel[:, start:end], self.pred_traj_rel[:, start:end],
+            self.obs_team_vec[:, start:end], self.obs_pos_vec[:, start:end],
+            self.obs_team_vec_pred[:, start:end], self.obs_pos_vec_pred[:, start:end],
             self.non_linear_ped[start:end], self.loss_mask[start:end, :]
         ]
         return out
+
+    def get_batch(self, indices):
+        """
+        Gather the sequences in indices into one batch with the same layout
+        as seq_collate, using one index_select per tensor instead of
+        slicing every sequence and concatenating the slices.
+        """
+        seq_start_end = self.seq_start_end[list(indices)]
+        _len = seq_start_end[:, 1] - seq_start_end[:, 0]
+        cum_end = torch.cumsum(_len, dim=0)
+        batch_start_end = torch.stack([cum_end - _len, cum_end], dim=1)
+        # dataset row of every pedestrian in the batch, in batch order
+        ped_idx = torch.arange(int(cum_end[-1])) + torch.repeat_interleave(
+            seq_start_end[:, 0] - batch_start_end[:, 0], _len)
+
+        out = [
+            self.obs_traj.index_select(1, ped_idx),
+            self.pred_traj.index_select(1, ped_idx),
+            self.obs_traj_rel.index_select(1, ped_idx),
+            self.pred_traj_rel.index_select(1, ped_idx),
+            self.obs_team_vec.index_select(1, ped_idx),
+            self.obs_pos_vec.index_select(1, ped_idx),
+            self.obs_team_vec_pred.index_select(1, ped_idx),
+            self.obs_pos_vec_pred.index_select(1, ped_idx),
+            self.non_linear_ped.index_select(0, ped_idx),
+            self.loss_mask.index_select(0, ped_idx),
+            batch_start_end
+        ]
+        return tuple(out)
@@ -613,6 +613,8 @@ class TrajectoryGenerator(nn.Module):
         - obs_traj: Tensor of shape (obs_len, batch, 2)
         - obs_traj_rel: Tensor of shape (obs_len, batch, 2)
         - seq_start_end: A list of tuples which delimit sequences within batch.
+        - obs_team, obs_pos: One-hot uint8 or float tensors of shape
+        (obs_len, batch, team_vec_len / pos_vec_len)
         - user_noise: Generally used for inference when you want to see
         relation between different types of noise and outputs.
         Output:
@@ -620,6 +622,8 @@ class TrajectoryGenerator(nn.Module):
         """
 
         batch = obs_traj_rel.size(1)
+        obs_team = obs_team.float()
+        obs_pos = obs_pos.float()
         # Encode seq
         final_encoder_h = self.encoder(obs_traj_rel, obs_team, obs_pos)
         # Pool States
@@ -724,10 +728,14 @@ class TrajectoryDiscriminator(nn.Module):
         Inputs:
         - traj: Tensor of shape (obs_len + pred_len, batch, 2)
         - traj_rel: Tensor of shape (obs_len + pred_len, batch, 2)
+        - team, pos: One-hot uint8 or float tensors of shape
+        (obs_len + pred_len, batch, team_vec_len / pos_vec_len)
         - seq_start_end: A list of tuples which delimit sequences within batch
         Output:
         - scores: Tensor of shape (batch,) with real/fake scores
         """
+        team = team.float()
+        pos = pos.float()
         final_h = self.encoder(traj_rel, team, pos)
         # Note: In case of 'global' option we are using start_pos as opposed to
         # end_pos. The intuition being that hidden state has the whole
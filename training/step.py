@@ -7,7 +7,7 @@ from sgan.losses import gan_g_loss, gan_d_loss, l2_loss
 def discriminator_step(
     args, batch, generator, discriminator, d_loss_fn, optimizer_d
 ):
-    batch = [tensor.cuda() for tensor in batch]
+    batch = [tensor.cuda(non_blocking=True) for tensor in batch]
     (obs_traj, pred_traj_gt, obs_traj_rel, pred_traj_gt_rel,
      obs_team_vec, obs_pos_vec, pred_team_vec, pred_pos_vec,
      non_linear_ped, loss_mask, seq_start_end) = batch
@@ -53,7 +53,7 @@ def discriminator_step(
 def generator_step(
     args, batch, generator, discriminator, g_loss_fn, optimizer_g
 ):
-    batch = [tensor.cuda() for tensor in batch]
+    batch = [tensor.cuda(non_blocking=True) for tensor in batch]
     (obs_traj, pred_traj_gt, obs_traj_rel, pred_traj_gt_rel,
      obs_team_vec, obs_pos_vec, pred_team_vec, pred_pos_vec,
      non_linear_ped, loss_mask, seq_start_end) = batch